@@ -1,17 +1,16 @@
 import random
 import queue
 from threading import Thread
-from time import monotonic
 from itertools import product, groupby
 
-import arcade
 import pyglet
 
 from .networking import server, client
 from . import __version__
 
 N_ROWS_AND_COLS = 7
-TEAMS = ["humans", "animals"]
+TEAMS = ("humans", "animals")
+OTHER_TEAM = {"humans": "animals", "animals": "humans"}
 COMPUTER_DELAY = 0.7
 
 CARD_TYPES = {
@@ -68,6 +67,33 @@ for kind, data in CARD_TYPES.items():
     else:
         for team in TEAMS:
             MOVABLE_FOR.setdefault(team, set()).add(kind)
+MOVABLE_FOR = {team: frozenset(kinds) for team, kinds in MOVABLE_FOR.items()}
+
+POINTS = {kind: data["points"] for kind, data in CARD_TYPES.items()}
+TEAM_OF = {kind: data.get("team") for kind, data in CARD_TYPES.items()}
+EATS = {kind: frozenset(data.get("eats", ())) for kind, data in CARD_TYPES.items()}
+SLOW = {kind: data.get("slow", False) for kind, data in CARD_TYPES.items()}
+IMMOVABLE = {kind: data.get("immovable", False) for kind, data in CARD_TYPES.items()}
+
+
+# names of the unit steps, matching the variants of directional cards
+DIRECTIONS = {(-1, 0): "left", (1, 0): "right", (0, -1): "down", (0, 1): "up"}
+
+
+def _ray(x, y, dx, dy):
+    cells = []
+    x, y = x + dx, y + dy
+    while 0 <= x < N_ROWS_AND_COLS and 0 <= y < N_ROWS_AND_COLS:
+        cells.append((x, y))
+        x, y = x + dx, y + dy
+    return tuple(cells)
+
+
+# for every cell, the cells in each of the DIRECTIONS, nearest first
+RAYS = {
+    (x, y): tuple(_ray(x, y, dx, dy) for dx, dy in DIRECTIONS)
+    for x, y in product(range(N_ROWS_AND_COLS), repeat=2)
+}
 
 
 class InvalidMove(Exception):
@@ -85,41 +111,38 @@ class GameOver(Exception):
 def generate_pile():
     result = []
     for kind, data in CARD_TYPES.items():
-        for _ in range(data["count"]):
-            if variants := data.get("variants"):
-                result.append(f"{kind}_{random.choice(variants)}")
-            else:
-                result.append(kind)
+        if variants := data.get("variants"):
+            result.extend(
+                f"{kind}_{variant}"
+                for variant in random.choices(variants, k=data["count"])
+            )
+        else:
+            result.extend([kind] * data["count"])
     random.shuffle(result)
     return result
 
 
-def can_see(point_1, point_2, allow_list, walls, max_distance=-1, check_resolution=2):
-    distance = arcade.get_distance(point_1[0], point_1[1], point_2[0], point_2[1])
-    steps = int(distance // check_resolution)
-    for step in range(steps + 1):
-        step_distance = step * check_resolution
-        u = step_distance / distance
-        midpoint = arcade.lerp_vec(point_1, point_2, u)
-        if max_distance != -1 and step_distance > max_distance:
-            return False
-        sprite_list = arcade.get_sprites_at_point(midpoint, walls)
-        for sprite in sprite_list:
-            if sprite not in allow_list:
-                return False
-    return True
+def sign(number):
+    return (number > 0) - (number < 0)
 
 
-@type.__call__
-class both:
-    def __eq__(self, other):
-        return other in ("animals", "humans")
+def can_see(cards, source, target):
+    # walk the cells strictly between source and target (which must be in a
+    # straight line) and check that none of them is occupied
+    (x, y), (target_x, target_y) = source, target
+    dx, dy = sign(target_x - x), sign(target_y - y)
+    x, y = x + dx, y + dy
+    while (x, y) != (target_x, target_y):
+        if cards[x][y] is not None:
+            return False
+        x, y = x + dx, y + dy
+    return True
 
 
 class Halali:
     def __init__(self, deal=True):
         self.to_play = "animals"
-        self.team = both
+        self.team = None  # hotseat: both teams play on this machine
         self.cards = [[None] * N_ROWS_AND_COLS for _ in range(N_ROWS_AND_COLS)]
         card_pile = iter(generate_pile())
         if deal:
@@ -141,11 +164,12 @@ class Halali:
 
         self.points = {team: 0 for team in TEAMS}
         self.turns_left = None
+        self.game_over = False
         self._tiles_left = N_ROWS_AND_COLS * N_ROWS_AND_COLS - 1
 
     @property
     def can_play(self):
-        return self.to_play == self.team
+        return self.team is None or self.to_play == self.team
 
     def check_can_play(self, for_enemy=False):
         if for_enemy:
@@ -159,7 +183,7 @@ class Halali:
         card = self.cards[card_x][card_y]
         if not card:
             raise InvalidMove("Trying to move empty tile")
-        if CARD_TYPES[card["kind"]].get("team") != self.to_play:
+        if TEAM_OF[card["kind"]] != self.to_play:
             raise InvalidMove("Can't rescue neutral pieces")
         rescue_possibilities = [
             (0, N_ROWS_AND_COLS // 2, "y"),
@@ -194,13 +218,14 @@ class Halali:
         card = self.cards[x][y]
         self.validate_rescue(x, y, for_enemy=for_enemy)
         self.cards[x][y] = None
-        self.points[self.to_play] += CARD_TYPES[card["kind"]]["points"]
+        self.points[self.to_play] += POINTS[card["kind"]]
         self._swap_teams()
         return True
 
     def _swap_teams(self):
         if self.turns_left is not None:
             self.turns_left -= 0.5
+            self.game_over = self.turns_left <= 0
         elif self._tiles_left == 0:
             self.turns_left = 5
         self.to_play = "animals" if self.to_play == "humans" else "humans"
@@ -224,42 +249,27 @@ class Halali:
         return True
 
     def validate_move(self, card_x, card_y, target_x, target_y, for_enemy=False):
-        if card_x == target_x and card_y == target_y:
+        dx, dy = target_x - card_x, target_y - card_y
+        if not dx and not dy:
             raise InvalidMove("Didn't move")
-        if card_x != target_x and card_y != target_y:
+        if dx and dy:
             raise InvalidMove("Can't move diagonally")
         if for_enemy:
-            team = {"humans": "animals", "animals": "humans"}[self.team]
+            team = OTHER_TEAM[self.team]
+        elif self.team is None:
+            team = self.to_play
         else:
             team = self.team
 
-        moving = None
-        if card_x != target_x:
-            # moving horizontally
-            smaller, bigger = min(card_x, target_x), max(card_x, target_x)
-            for inbetween in range(smaller + 1, bigger):
-                if self.cards[inbetween][card_y] is not None:
-                    raise InvalidMove("Path obstructed")
-            if card_x > target_x:
-                moving = "left"
-            else:
-                moving = "right"
-        elif card_y != target_y:
-            # moving horizontally
-            smaller, bigger = min(card_y, target_y), max(card_y, target_y)
-            for inbetween in range(smaller + 1, bigger):
-                if self.cards[card_x][inbetween] is not None:
-                    raise InvalidMove("Path obstructed")
-            if card_y > target_y:
-                moving = "down"
-            else:
-                moving = "up"
+        if not can_see(self.cards, (card_x, card_y), (target_x, target_y)):
+            raise InvalidMove("Path obstructed")
         card = self.cards[card_x][card_y]
         if not card:
             raise InvalidMove("Can't move empty tile")
-        if CARD_TYPES[card["kind"]].get("slow") and (bigger - smaller) > 1:
+        # the move is straight, so this is the distance travelled
+        if SLOW[card["kind"]] and abs(dx + dy) > 1:
             raise InvalidMove(f"{card['kind']} can only move one tile")
-        if CARD_TYPES[card["kind"]].get("immovable"):
+        if IMMOVABLE[card["kind"]]:
             raise InvalidMove(f"{card['kind']} can't move")
         if card["kind"] not in MOVABLE_FOR[team]:
             raise InvalidMove(f"Team {team} can't move {card['kind']}")
@@ -269,9 +279,10 @@ class Halali:
         if target:
             if target["facing"] != "up":
                 raise InvalidMove("Can't go to face-down card.")
-            if target["kind"] not in CARD_TYPES[card["kind"]].get("eats", []):
+            if target["kind"] not in EATS[card["kind"]]:
                 raise InvalidMove(f"{card['kind']} can't eat {target['kind']}")
-            if card.get("directional") and moving != card["variant"]:
+            # directional cards can only kill in the direction they face
+            if card.get("directional") and DIRECTIONS[sign(dx), sign(dy)] != card["variant"]:
                 raise InvalidMove(f"{card['kind']} can only kill {card['variant']}")
         return True
 
@@ -287,7 +298,7 @@ class Halali:
             for_enemy=for_enemy,
         )
         if target := self.cards[target_x][target_y]:
-            self.points[self.to_play] += CARD_TYPES[target["kind"]]["points"]
+            self.points[self.to_play] += POINTS[target["kind"]]
         self.cards[target_x][target_y] = self.cards[card_x][card_y]
         self.cards[card_x][card_y] = None
         self._swap_teams()
@@ -295,23 +306,23 @@ class Halali:
 
     def available_moves(self, location, for_enemy=False):
         x, y = location
-        # horizontal:
-        for target_x in range(N_ROWS_AND_COLS):
-            try:
-                self.validate_move(x, y, target_x, y, for_enemy=for_enemy)
-                yield target_x, y
-            except InvalidMove:
-                pass
-        # vertical:
-        for target_y in range(N_ROWS_AND_COLS):
-            try:
-                self.validate_move(x, y, x, target_y, for_enemy=for_enemy)
-                yield x, target_y
-            except InvalidMove:
-                pass
+        for (dx, dy), ray in zip(DIRECTIONS, RAYS[x, y]):
+            reachable = []
+            for target_x, target_y in ray:
+                try:
+                    self.validate_move(x, y, target_x, target_y, for_enemy=for_enemy)
+                    reachable.append((target_x, target_y))
+                except InvalidMove:
+                    pass
+                if self.cards[target_x][target_y] is not None:
+                    break  # everything behind this card is obstructed
+            # keep targets in ascending order along each axis
+            if dx + dy < 0:
+                reachable.reverse()
+            yield from reachable
 
     def update(self, _view):
-        if self.turns_left is not None and self.turns_left <= 0:
+        if self.game_over:
             raise GameOver
 
 
@@ -347,7 +358,7 @@ class SPHalali(Halali):
 
     @property
     def other_team(self):
-        return {"animals": "humans", "humans": "animals"}[self.team]
+        return OTHER_TEAM[self.team]
 
     def _swap_teams(self):
         super()._swap_teams()
@@ -356,6 +367,8 @@ class SPHalali(Halali):
 
     def move_for_opponent(self, _dt):
         possible_moves = []
+        other_team = self.other_team
+        movable = MOVABLE_FOR[other_team]
         for source in product(range(N_ROWS_AND_COLS), repeat=2):
             source_x, source_y = source
             card = self.cards[source_x][source_y]
@@ -363,7 +376,7 @@ class SPHalali(Halali):
                 continue
             if card["facing"] == "down":
                 possible_moves.append(("reveal", source, 0))
-            elif card["kind"] not in MOVABLE_FOR[self.other_team]:
+            elif card["kind"] not in movable:
                 continue
             else:
                 for target in self.available_moves(source, for_enemy=True):
@@ -371,7 +384,7 @@ class SPHalali(Halali):
                     target_card = self.cards[target_x][target_y]
                     if target_card:
                         possible_moves.append(("move", source, target, 2))
-                    elif card.get("team") == self.other_team:
+                    elif card.get("team") == other_team:
                         possible_moves.append(("move", source, target, 1))
                     else:
                         possible_moves.append(("move", source, target, 0))
@@ -438,7 +451,7 @@ class MPServerHalali(NetworkedHalali):
                     "status",
                     {
                         "to_play": self.to_play,
-                        "client_team": ("animals"if self.team == "humans"else "humans"),
+                        "client_team": OTHER_TEAM[self.team],
                         "points": self.points,
                         "version": __version__,
                     },
@@ -497,18 +510,27 @@ class MPClientHalali(NetworkedHalali):
         self.handle_response(None, block=True)
         self.handle_response(None, block=True)
         self.send_queue
-        self.last_update = monotonic()
+        pyglet.clock.schedule_interval(self.ping, 0.5)
         self.update()
 
-    def update(self, view=None):
-        super().update(view)
-        # make outgoing status requests every 0.5s
-        t = monotonic()
-        if t - self.last_update > 0.5:
+    def ping(self, _dt):
+        # give the server a chance to answer with its moves, unless a request
+        # is still waiting to go out anyway (its answer serves the same purpose)
+        if self.send_queue.empty():
             self.send_queue.put(["ping"])
-            self.last_update = monotonic()
+
+    def update(self, view=None):
+        try:
+            super().update(view)
+        except GameOver:
+            self.stop_pinging()
+            raise
         self.handle_response(view)
 
+    def stop_pinging(self):
+        # the clock holds on to self.ping, and with it this game
+        pyglet.clock.unschedule(self.ping)
+
     def handle_response(self, view, block=False):
         try:
             message = self.recv_queue.get(block=block)
@@ -522,11 +544,13 @@ class MPClientHalali(NetworkedHalali):
                 self.team = status["client_team"]
                 self.points = status["points"]
                 self.turns_left = status.get("turns_left", None)
+                self.game_over = self.turns_left is not None and self.turns_left <= 0
             case ["ok"]:
                 pass
             case None:  # "pong"
                 pass
             case ["disconnected"]:
+                self.stop_pinging()
                 ...  # go to main window
             case ["cards", cards]:
                 self.cards = cards
@@ -1,5 +1,4 @@
 import json
-import queue
 import random
 import socket
 from contextlib import contextmanager
@@ -14,6 +13,38 @@ from zeroconf import (
 )
 
 
+# json.dumps builds a new encoder whenever it gets non-default arguments
+encode_json = json.JSONEncoder(separators=(",", ":")).encode
+
+# the card list, the largest message, is a few kB; anything announcing much
+# more than this is not a halali peer (or not a compatible one)
+MAX_MESSAGE_SIZE = 1 << 20
+
+
+def recv_exactly(conn, size):
+    data = bytearray()
+    while len(data) < size:
+        # recv allocates as much as it is asked for, so ask in bounded chunks
+        chunk = conn.recv(min(size - len(data), 65536))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return data
+
+
+def send_message(conn, message):
+    # messages are JSON, prefixed with their length as 4 bytes
+    payload = encode_json(message).encode()
+    conn.sendall(len(payload).to_bytes(4, "big") + payload)
+
+
+def recv_message(conn):
+    size = int.from_bytes(recv_exactly(conn, 4), "big")
+    if size > MAX_MESSAGE_SIZE:
+        raise ConnectionError(f"Message too large ({size} bytes)")
+    return json.loads(recv_exactly(conn, size))
+
+
 def server(send, recv):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
@@ -24,18 +55,19 @@ def server(send, recv):
             conn, addr = s.accept()
         print(addr, "connected")
         while True:
-            msg = conn.recv(8192)
-            if not msg:
+            try:
+                msg = recv_message(conn)
+            except ConnectionError:
                 recv.put(["disconnected"])
                 return
-            recv.put(json.loads(msg))  # TODO: make resilient
+            recv.put(msg)
             while True:
                 response = send.get()  # blocking, wait for game to respond
                 if not response and send.qsize():
                     continue  # not guaranteed to work
                 break
             print("Actually sending...")
-            conn.sendall(json.dumps(response, separators=",:").encode())
+            send_message(conn, response)
     finally:
         s.close()
 
@@ -46,20 +78,15 @@ def client(send, recv, server):
     conn.connect(server)
     print("Connected!")
     while True:
+        msg = send.get()  # blocking, the game pings regularly
         try:
-            msg = send.get(block=False, timeout=0)
-        except queue.Empty:
-            sleep(0.5)
-            continue
-            # msg = {"T": "status"}
-        conn.sendall(json.dumps(msg, separators=",:").encode())
-        data = conn.recv(8192)
-        if not data:
+            send_message(conn, msg)
+            data = recv_message(conn)
+        except ConnectionError:
             recv.put(["disconnected"])
             return
         print("Received:", data)
-        recv.put(json.loads(data))
-        sleep(0.2)
+        recv.put(data)
 
 
 @contextmanager
@@ -24,7 +24,7 @@ class Settings:
         return self.state.copy()
 
     def label(self, name):
-        return {True: "yes", False: "no"}[self.state[name]]
+        return "yes" if self.state[name] else "no"
 
     def click(self, name):
         self.state[name] = not self.state[name]
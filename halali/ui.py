@@ -2,8 +2,8 @@ import sys
 import os
 import random
 from glob import glob
-from itertools import count
-from functools import partial
+from itertools import count, product
+from functools import partial, cache
 
 import arcade
 import arcade.gui
@@ -17,6 +17,7 @@ from .game import (
     MPServerHalali,
     MPClientHalali,
     MOVABLE_FOR,
+    TEAMS,
     InvalidMove,
     GameOver,
     Disconnected,
@@ -47,6 +48,13 @@ SCREEN_WIDTH = N_ROWS_AND_COLS * CARD_SIZE + 2 * SCREEN_MARGIN
 SCREEN_HEIGHT = N_ROWS_AND_COLS * CARD_SIZE + 2 * SCREEN_MARGIN
 BORDER_WIDTH = 15
 
+# centers of all columns/rows, including the exits just outside the board;
+# index with location + 1
+CELL_CENTERS = tuple(
+    SCREEN_MARGIN + CARD_SIZE / 2 + i * CARD_SIZE
+    for i in range(-1, N_ROWS_AND_COLS + 1)
+)
+
 SOUNDS = [
     "duck",
     "shoot",
@@ -89,6 +97,16 @@ def path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
+@cache
+def load_tile(name, hit_box_algorithm="Simple"):
+    # arcade caches the decoded images itself, but this also saves resolving
+    # the path and building arcade's cache key for every single card
+    return arcade.load_texture(
+        path(f"resources/tiles/{name}.png"),
+        hit_box_algorithm=hit_box_algorithm,
+    )
+
+
 def location_from_position(position):
     x, y = position
     return (
@@ -98,10 +116,7 @@ def location_from_position(position):
 
 def position_from_location(location):
     x, y = location
-    return (
-        SCREEN_MARGIN + CARD_SIZE / 2 + x * CARD_SIZE,
-        SCREEN_MARGIN + CARD_SIZE / 2 + y * CARD_SIZE,
-    )
+    return CELL_CENTERS[x + 1], CELL_CENTERS[y + 1]
 
 
 class Then:
@@ -118,21 +133,22 @@ class Card(arcade.Sprite):
         self._easings = []
 
         # Image to use for the sprite when face down
-        self.image_file_name = path("resources/tiles/hidden.png")
-
-        super().__init__(
-            self.image_file_name,
-            scale=1,
-            hit_box_algorithm="None",
-        )
+        hidden = load_tile("hidden", hit_box_algorithm="None")
+        super().__init__(texture=hidden, scale=1)
         if "variant" in card_info:
             texture = f"{card_info['kind']}_{card_info['variant']}"
         else:
             texture = card_info["kind"]
-        self.append_texture(arcade.load_texture(path(f"resources/tiles/{texture}.png")))
+        # arcade only fills in .textures itself when loading from a file
+        self.textures = [hidden, load_tile(texture)]
         self.kind = card_info["kind"]
+        self.movable_by = frozenset(
+            team for team in TEAMS if self.kind in MOVABLE_FOR[team]
+        )
         self.being_held = False
         self.orig_position = None
+        # the board location, kept up to date by the view
+        self.location = None
         if card_info["facing"] == "up":
             self.turn_over()
 
@@ -252,6 +268,7 @@ class GameView(arcade.View):
         arcade.set_background_color(arcade.color.AMAZON)
 
         self.place_list = arcade.SpriteList()
+        self.place_at = {}
         for x in range(N_ROWS_AND_COLS):
             for y in range(N_ROWS_AND_COLS):
                 place = arcade.SpriteSolidColor(
@@ -262,9 +279,25 @@ class GameView(arcade.View):
                 place.is_exit = False
                 place.position = position_from_location((x, y))
                 self.place_list.append(place)
+                self.place_at[x, y] = place
 
         self.card_list = arcade.SpriteList()
+        # one indicator per place, shown while a card that can go there is held
         self.indicator_list = arcade.SpriteList()
+        self.indicator_at = {}
+        for location in product(range(N_ROWS_AND_COLS), repeat=2):
+            indicator = arcade.SpriteSolidColor(
+                CARD_SIZE // 8,
+                CARD_SIZE // 8,
+                COLOR_INDICATOR,
+            )
+            indicator.position = position_from_location(location)
+            indicator.visible = False
+            self.indicator_list.append(indicator)
+            self.indicator_at[location] = indicator
+        # the held card lives in its own list while dragged, so it is drawn on
+        # top without reshuffling card_list
+        self.held_list = arcade.SpriteList()
         self.sync_cards()
 
         self.animal_score = arcade.Text(
@@ -294,6 +327,9 @@ class GameView(arcade.View):
             font_size=36,
             color=COLOR_TEXT,
         )
+        self._hud_state = None
+        # batched HUD geometry, by accent color and turn counter position
+        self._hud_shapes = {}
 
     def play_sound(self, sound, after=0, pan=0):
         if not self.settings["sound"]:
@@ -312,8 +348,8 @@ class GameView(arcade.View):
         if isinstance(location_or_card, Card):
             cards = [location_or_card]
         else:
-            position = position_from_location(location_or_card)
-            cards = arcade.get_sprites_at_point(position, self.card_list)
+            card = self.card_at.get(tuple(location_or_card))
+            cards = [card] if card else []
 
         for card in cards:
             self.play_sound("card", pan=card.pan)
@@ -330,9 +366,10 @@ class GameView(arcade.View):
     def rescue(self, location_or_card):
         if isinstance(location_or_card, Card):
             cards = [location_or_card]
+            self.card_at.pop(location_or_card.location, None)
         else:
-            position = position_from_location(location_or_card)
-            cards = arcade.get_sprites_at_point(position, self.card_list)
+            card = self.card_at.pop(tuple(location_or_card), None)
+            cards = [card] if card else []
 
         for card in cards:
             match card:
@@ -347,22 +384,24 @@ class GameView(arcade.View):
     def move(self, source_location_or_card, target_location):
         if isinstance(source_location_or_card, Card):
             source_cards = [source_location_or_card]
+            source_location = source_location_or_card.location
         else:
-            source_position = position_from_location(source_location_or_card)
-            source_cards = arcade.get_sprites_at_point(source_position, self.card_list)
-
-        target_x, target_y = target_position = position_from_location(target_location)
-        for card in arcade.get_sprites_at_point(target_position, self.card_list):
-            if card not in source_cards:
-                target_card = card
-                break
-        else:
-            target_card = None
+            source_location = tuple(source_location_or_card)
+            source_card = self.card_at.get(source_location)
+            source_cards = [source_card] if source_card else []
+
+        target_location = tuple(target_location)
+        target_x, target_y = position_from_location(target_location)
+        target_card = self.card_at.get(target_location)
 
+        self.card_at.pop(source_location, None)
         for card in source_cards:
-            # pull to top
-            self.card_list.remove(card)
-            self.card_list.append(card)
+            self.card_at[target_location] = card
+            card.location = target_location
+            # pull to top, unless it already is (e.g. just dropped by the player)
+            if self.card_list[-1] is not card:
+                self.card_list.remove(card)
+                self.card_list.append(card)
             card.animate("center_x", target_x, duration=0.2, ease="ease_out")
             card.animate("center_y", target_y, duration=0.2, ease="ease_out").then(target_card and target_card.kill)
             if target_card:
@@ -397,13 +436,17 @@ class GameView(arcade.View):
 
     def sync_cards(self):
         self.card_list.clear()
+        # which card is on which location, to avoid searching the sprite list
+        self.card_at = {}
         for x, row in enumerate(self.game.cards):
             for y, card_info in enumerate(row):
                 if not card_info:
                     continue
                 card = Card(card_info)
                 card.position = position_from_location((x, y))
+                card.location = x, y
                 self.card_list.append(card)
+                self.card_at[x, y] = card
 
     def on_key_press(self, key, modifiers):
         if key == arcade.key.F2:
@@ -416,30 +459,18 @@ class GameView(arcade.View):
 
     def add_exits(self):
         self._exits_added = True
+        middle = CELL_CENTERS[N_ROWS_AND_COLS // 2 + 1]
         for pos in [
-            (
-                SCREEN_MARGIN + CARD_SIZE / 2 + (N_ROWS_AND_COLS // 2) * CARD_SIZE,
-                SCREEN_MARGIN + CARD_SIZE / 2 + -1 * CARD_SIZE,
-            ),
-            (
-                SCREEN_MARGIN + CARD_SIZE / 2 + (N_ROWS_AND_COLS // 2) * CARD_SIZE,
-                SCREEN_MARGIN + CARD_SIZE / 2 + N_ROWS_AND_COLS * CARD_SIZE,
-            ),
-            (
-                SCREEN_MARGIN + CARD_SIZE / 2 + -1 * CARD_SIZE,
-                SCREEN_MARGIN + CARD_SIZE / 2 + (N_ROWS_AND_COLS // 2) * CARD_SIZE,
-            ),
-            (
-                SCREEN_MARGIN + CARD_SIZE / 2 + N_ROWS_AND_COLS * CARD_SIZE,
-                SCREEN_MARGIN + CARD_SIZE / 2 + (N_ROWS_AND_COLS // 2) * CARD_SIZE,
-            ),
+            (middle, CELL_CENTERS[0]),
+            (middle, CELL_CENTERS[-1]),
+            (CELL_CENTERS[0], middle),
+            (CELL_CENTERS[-1], middle),
         ]:
-            exit = arcade.Sprite(
-                path("resources/tiles/center.png"),
-            )
+            exit = arcade.Sprite(texture=load_tile("center"))
             exit.is_exit = True
             exit.position = pos
             self.place_list.append(exit)
+            self.place_at[location_from_position(pos)] = exit
 
     def on_draw(self):
         """ Render the screen. """
@@ -450,8 +481,7 @@ class GameView(arcade.View):
         self.card_list.draw()
         if self.settings["indicators"]:
             self.indicator_list.draw()
-        if self.held_card:
-            self.held_card.draw()
+        self.held_list.draw()
         self.camera_hud.use()
         self.draw_hud()
         if self.debug:
@@ -492,44 +522,71 @@ class GameView(arcade.View):
 
 
     def draw_hud(self):
-        arcade.draw_rectangle_outline(
+        if self.game.turns_left is not None:
+            turns_x = SCREEN_WIDTH // 8 * (1 if self.game.to_play == "animals" else 7)
+        else:
+            turns_x = None
+        key = self.accent_color, turns_x
+        if key not in self._hud_shapes:
+            self._hud_shapes[key] = self.build_hud_shapes(*key)
+        self._hud_shapes[key].draw()
+
+        # only touch the labels when something changed, re-layouting text is
+        # expensive
+        hud_state = (
+            self.game.points["humans"],
+            self.game.points["animals"],
+            self.game.turns_left,
+            self.game.to_play,
+        )
+        if hud_state != self._hud_state:
+            self._hud_state = hud_state
+            self.update_hud_text()
+
+        self.human_score.draw()
+        self.animal_score.draw()
+
+        if self.game.turns_left is not None:
+            self.turn_counter.draw()
+
+    def build_hud_shapes(self, accent_color, turns_x):
+        shapes = arcade.ShapeElementList()
+        shapes.append(arcade.create_rectangle_outline(
             SCREEN_WIDTH // 2,
             SCREEN_HEIGHT // 2,
             SCREEN_WIDTH,
             SCREEN_HEIGHT,
-            color=self.accent_color,
+            color=accent_color,
             border_width=BORDER_WIDTH,
-        )
-
-        arcade.draw_rectangle_filled(
+        ))
+        shapes.append(arcade.create_rectangle_filled(
             SCREEN_WIDTH,
             0,
             TEXT_MARGIN * 4,
             TEXT_MARGIN * 4,
             color=COLOR_HUMANS,
-        )
-        self.human_score.text = str(self.game.points["humans"])
-        self.human_score.draw()
-
-        arcade.draw_rectangle_filled(
+        ))
+        shapes.append(arcade.create_rectangle_filled(
             0,
             0,
             TEXT_MARGIN * 4,
             TEXT_MARGIN * 4,
             color=COLOR_ANIMALS,
-        )
-        self.animal_score.text = str(self.game.points["animals"])
-        self.animal_score.draw()
-
-        if self.game.turns_left is not None:
-            x_pos = SCREEN_WIDTH // 8 * (1 if self.game.to_play == "animals" else 7)
-            arcade.draw_rectangle_filled(
-                x_pos,
+        ))
+        if turns_x is not None:
+            shapes.append(arcade.create_rectangle_filled(
+                turns_x,
                 SCREEN_HEIGHT + TEXT_MARGIN // 2,
                 SCREEN_WIDTH // 2,
                 TEXT_MARGIN * 4,
-                color=self.accent_color,
-            )
+                color=accent_color,
+            ))
+        return shapes
+
+    def update_hud_text(self):
+        self.human_score.text = str(self.game.points["humans"])
+        self.animal_score.text = str(self.game.points["animals"])
+        if self.game.turns_left is not None:
             self.turn_counter.text = f"{round(self.game.turns_left + 0.1)} turns left"
             if self.game.to_play == "animals":
                 self.turn_counter.x = TEXT_MARGIN
@@ -537,84 +594,81 @@ class GameView(arcade.View):
             elif self.game.to_play == "humans":
                 self.turn_counter.x = SCREEN_WIDTH - TEXT_MARGIN
                 self.turn_counter.anchor_x = "right"
-            self.turn_counter.draw()
 
     def on_mouse_press(self, x, y, button, key_modifiers):
-        if not self.game.can_play:
+        game = self.game
+        if not game.can_play:
             print("Can't play")
             return
-        cards = arcade.get_sprites_at_point((x, y), self.card_list)
-        if cards:
-            card = cards[-1]
-            loc = location_from_position(round_position(card.position))
-            if card.facing == "down" and self.game.attempt_reveal(loc):
+        loc = location_from_position(round_position((x, y)))
+        card = self.card_at.get(loc)
+        if card and card.collides_with_point((x, y)):
+            if card.facing == "down" and game.attempt_reveal(loc):
                 self.reveal(card)
                 return
-            if card.kind not in MOVABLE_FOR[self.game.to_play]:
+            if game.to_play not in card.movable_by:
                 return
-            self.held_card = cards[-1]
-            self.held_card.hold()
-            self.card_list.remove(self.held_card)
-            self.card_list.append(self.held_card)
+            self.held_card = card
+            card.hold()
+            self.card_list.remove(card)
+            self.held_list.append(card)
             if self.settings["indicators"]:
-                for x, y in self.game.available_moves(loc):
-                    indicator = arcade.SpriteSolidColor(
-                        CARD_SIZE // 8,
-                        CARD_SIZE // 8,
-                        COLOR_INDICATOR,
-                    )
-                    indicator.position = position_from_location((x, y))
-                    self.indicator_list.append(indicator)
+                for location in game.available_moves(loc):
+                    self.indicator_at[location].visible = True
             self.play_sound("pickup")
 
     def on_mouse_motion(self, x, y, dx, dy):
         if self.debug:
             self.debug_info["mouse_pos"] = x, y
-        if self.held_card:
-            self.held_card.center_x += dx
-            self.held_card.center_y += dy
+        held_card = self.held_card
+        if held_card is None:
+            return
+        held_card.center_x += dx
+        held_card.center_y += dy
 
     def on_mouse_release(self, x, y, button, key_modifiers):
-        if self.held_card:
-            place, distance = arcade.get_closest_sprite(self.held_card, self.place_list)
+        held_card = self.held_card
+        if held_card is None:
+            return
+        self.held_card = None
+        self.held_list.remove(held_card)
+        self.card_list.append(held_card)
+        for indicator in self.indicator_list:
+            if indicator.visible:
+                indicator.visible = False
+
+        # places are on a grid, so the nearest one is wherever the card would
+        # snap to
+        location = location_from_position(round_position(held_card.position))
+        place = self.place_at.get(location)
+        if place is None:
+            self.reject_move(held_card, "Not intersecting with a place")
+        elif location == held_card.location:
+            self.reject_move(held_card, "Already at this place")
+        else:
+            source = held_card.location
             try:
-                if not arcade.check_for_collision(self.held_card, place):
-                    # Not on a place
-                    raise InvalidMove("Not intersecting with a place")
-                if self.held_card.game_position == place.position:
-                    # Didn't move card
-                    raise InvalidMove("Already at this place")
-
-                location = location_from_position(place.position)
                 if place.is_exit:
-                    if self.game.attempt_rescue(
-                        location_from_position(self.held_card.game_position),
-                    ):
-                        self.rescue(self.held_card)
-                        self.held_card = None
+                    if self.game.attempt_rescue(source):
+                        self.rescue(held_card)
                         return
-
-                if self.game.attempt_move(
-                    location_from_position(self.held_card.game_position),
-                    location,
-                ):
-                    self.move(self.held_card, location)
-
+                elif self.game.attempt_move(source, location):
+                    self.move(held_card, location)
             except InvalidMove as e:
-                print(e.args[0])
-                self.camera_game.shake(Vec2(10, 0), speed=5)
-                self.play_sound("no")
-                game_pos_x, game_pos_y = self.held_card.game_position
-                self.held_card.animate("center_x", game_pos_x, duration=0.2)
-                self.held_card.animate("center_y", game_pos_y, duration=0.2)
-            finally:
-                if self.held_card:
-                    self.held_card.release()
-                    self.held_card = None
-                self.indicator_list.clear()
+                self.reject_move(held_card, e.args[0])
+        held_card.release()
+
+    def reject_move(self, card, reason):
+        print(reason)
+        self.camera_game.shake(Vec2(10, 0), speed=5)
+        self.play_sound("no")
+        game_pos_x, game_pos_y = card.game_position
+        card.animate("center_x", game_pos_x, duration=0.2)
+        card.animate("center_y", game_pos_y, duration=0.2)
 
     def on_update(self, delta_time):
         self.card_list.on_update(delta_time)
+        self.held_list.on_update(delta_time)
 
     def update(self, delta_time):
         if self.game.turns_left is not None and not self._exits_added: